@@ -3,17 +3,98 @@ import pandas as pd
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
-from PIL import Image
+from PIL import Image, ImageOps
 import os
+import copy
+import math
+import json
+import threading
+import time
 
 # NEW: minimal helpers for URL support
-import requests, io, tempfile, csv
+import requests, io, tempfile, csv, hashlib, zipfile
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from pptx.opc.serialized import _ZipPkgWriter  # private; only used for the save speed-up
+except ImportError:
+    _ZipPkgWriter = None
+try:
+    import httpx  # optional: HTTP/2 lets parallel image GETs share one connection
+except ImportError:
+    httpx = None
+try:
+    import pyvips  # optional: faster SIMD resize with JPEG shrink-on-load
+except (ImportError, OSError):  # OSError: binding installed but libvips missing
+    pyvips = None
 
 # ------------------------------------------------------------------------------
 # Load data (UNCHANGED path — keep your Excel beside app.py)
 # ------------------------------------------------------------------------------
-data = pd.read_excel("all companys database.xlsx")
+EXCEL_PATH = "all companys database.xlsx"
+
+EXCEL_CACHE = Path(EXCEL_PATH).with_suffix(".parquet")
+
+def _read_xlsx():
+    try:
+        # Rust-based python-calamine parses ~10x faster than openpyxl
+        df = pd.read_excel(EXCEL_PATH, engine="calamine")
+    except (ImportError, ValueError):  # not installed / pandas < 2.2 without the engine
+        df = pd.read_excel(EXCEL_PATH)
+    # Parquet columns are single-typed: stringify strays like an int Type of 356
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+    return df
+
+# cache_resource hands back the same object without pickling/hashing it on every
+# rerun; the sheet and manifest are read-only after load, so sharing is safe.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_excel(mtime: float):
+    """Parse the product sheet once per file version instead of on every rerun.
+
+    A zstd Parquet copy beside the xlsx survives process restarts, so a cold
+    start reads columnar data instead of re-parsing the workbook.
+    """
+    try:
+        if EXCEL_CACHE.stat().st_mtime >= mtime:
+            df = pd.read_parquet(EXCEL_CACHE)
+            return df.where(df.notna(), float("nan"))  # Parquet nulls come back as None
+    except Exception:  # missing, stale-format or no pyarrow: rebuild below
+        pass
+    df = _read_xlsx()
+    try:
+        df.to_parquet(EXCEL_CACHE, compression="zstd", index=False)
+    except Exception:  # read-only checkout / no pyarrow: xlsx parse still works
+        pass
+    return df
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def build_indexes(mtime: float):
+    """Group the sheet once so selectbox reruns are dict lookups, not O(N) scans.
+
+    Returns (companies, products_by_company, rows_by_cp, type_lower).
+    """
+    df = load_excel(mtime)
+    # tuples: these are shared across sessions by cache_resource, so keep them read-only
+    companies = tuple(sorted(df['Company'].dropna().unique()))
+    products_by_company = {
+        c: tuple(sorted(g['Product'].dropna().unique())) for c, g in df.groupby('Company', sort=False)
+    }
+    # plain (row index, Type, Link) tuples: no per-row Series for iterrows() to build
+    links = df['Link'] if 'Link' in df.columns else pd.Series('', index=df.index)
+    rows_by_cp = {
+        cp: tuple(zip(g.index, g['Type'], links[g.index]))
+        for cp, g in df.groupby(['Company', 'Product'], sort=False)
+    }
+    type_lower = df['Type'].str.lower()
+    return companies, products_by_company, rows_by_cp, type_lower
+
+EXCEL_MTIME = os.path.getmtime(EXCEL_PATH)
+data = load_excel(EXCEL_MTIME)
+COMPANIES, PRODUCTS_BY_COMPANY, ROWS_BY_CP, TYPE_LOWER = build_indexes(EXCEL_MTIME)
 
 
 # Local fallback bases (original behavior kept)
@@ -21,6 +102,9 @@ IMAGE_BASE = "images"
 LOGO_BASE = "static/logo"
 FIRST_PATH = "static/img/first.png"  # <-- add
 LAST_PATH  = "static/img/last.png"
+# intro/outro are bundled local PNGs: resolve them once here, not per build
+FIRST_LOCAL = FIRST_PATH if os.path.exists(FIRST_PATH) else None
+LAST_LOCAL  = LAST_PATH if os.path.exists(LAST_PATH) else None
 # ------------------------------------------------------------------------------
 # NEW: Optional manifest support (Cloudflare R2)
 #   - If st.secrets.IMAGE_MANIFEST_URL is set, load from URL
@@ -30,35 +114,79 @@ LAST_PATH  = "static/img/last.png"
 BASE_DIR = Path(__file__).parent
 LOCAL_MANIFEST = BASE_DIR / "image_manifest.csv"
 
+# One keep-alive session for all R2 fetches (manifest, previews, PPT images), so
+# the TCP+TLS handshake is paid once per pooled connection, not once per image.
+# cache_resource keeps it alive across Streamlit reruns.
+@st.cache_resource
+def _http_session():
+    s = requests.Session()
+    # pool_maxsize bounds the idle keep-alive sockets per host; keep it above the
+    # download workers so a concurrent prefetch never discards and re-dials one
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64,
+                          max_retries=Retry(total=3, backoff_factor=0.3))
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)  # plain-http manifest/image hosts get pooling + retries too
+    return s
+
+SESSION = _http_session()
+
+@st.cache_resource
+def _http2_client():
+    """Thread-safe HTTP/2 client for image downloads, or None if httpx/h2 aren't installed."""
+    if httpx is None:
+        return None
+    try:
+        return httpx.Client(http2=True, timeout=60, follow_redirects=True,
+                            transport=httpx.HTTPTransport(http2=True, retries=3))
+    except ImportError:  # httpx without the h2 extra
+        return None
+
+HTTP2_CLIENT = _http2_client()
+
 
 import unicodedata
+from functools import lru_cache
 from pathlib import Path
 
 
 
+# Memo lasts one script run only: Streamlit re-executes the module (and so rebuilds
+# these caches) on every rerun. Mainly helps build_row_images' pass over the sheet.
+@lru_cache(maxsize=16384)
 def _norm(s: str) -> str:
     """lowercase, trim, collapse internal spaces"""
     s = str(s or "")
     s = unicodedata.normalize("NFKC", s)
     return " ".join(s.strip().split()).lower()
 
-def _tokens(s: str) -> set:
+@lru_cache(maxsize=16384)
+def _tokens(s: str) -> frozenset:
     s = _norm(s).replace("-", " ").replace("_", " ")
-    return set([t for t in s.split() if t])
+    return frozenset(t for t in s.split() if t)
 
 
 def _child_caseless(parent: Path, wanted: str) -> Path | None:
     """Find child folder ignoring case/extra spaces."""
-    wanted_n = _norm(wanted)
-    if not parent.exists() or not parent.is_dir():
+    try:
+        if not parent.is_dir():
+            return None
+        index = _dir_index(str(parent), parent.stat().st_mtime_ns)
+    except OSError:
         return None
-    for p in parent.iterdir():
-        try:
-            if p.is_dir() and _norm(p.name) == wanted_n:
-                return p
-        except Exception:
-            continue
-    return None
+    return index.get(_norm(wanted))
+
+@st.cache_resource(show_spinner=False, max_entries=2048)
+def _dir_index(parent: str, mtime_ns: int) -> dict:
+    """{normalized name: Path} of parent's subfolders; mtime_ns keys out stale listings."""
+    index = {}
+    with os.scandir(parent) as it:  # DirEntry.is_dir() uses d_type: no stat per entry
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    index.setdefault(_norm(entry.name), Path(entry.path))  # first match wins, as the old scan did
+            except OSError:
+                continue
+    return index
 
 def resolve_caseless_path(base_dir: str | Path, *segments: str) -> Path | None:
     """Walk down a folder tree case-insensitively."""
@@ -79,39 +207,121 @@ def show_image_safe(src):
             st.caption("⚠️ Empty image reference")
             return
         if "://" in s:
-            r = requests.get(s, timeout=30)
-            r.raise_for_status()
-            img = Image.open(io.BytesIO(r.content)).convert("RGB")
-        else:
-            img = Image.open(s).convert("RGB")
-        st.image(img, use_column_width=True)
+            thumb = _thumb_path(s)
+            if _cache_hit(thumb):
+                s = str(thumb)  # warmed by warm_image_cache(): serve the small copy
+        # URLs are fetched by the browser in parallel and local file bytes are served
+        # as-is: no blocking download or server-side decode during the rerun
+        st.image(s, use_column_width=True)
     except Exception as e:
         st.caption(f"⚠️ Failed to preview image ({src}): {e}")
 
-@st.cache_data(show_spinner=False)
-def load_manifest():
+def _manifest_url() -> str:
+    try:
+        return (st.secrets.get("IMAGE_MANIFEST_URL", "") or "").strip()
+    except Exception:  # no secrets.toml at all: st.secrets raises instead of returning ""
+        return ""
+
+@st.cache_data(show_spinner=False, ttl=300)
+def manifest_version() -> str:
+    """
+    Cheap fingerprint of the manifest source, used as load_manifest's cache key:
+    ETag/Last-Modified via HEAD for the URL, mtime for the local CSV. So an edited
+    manifest is picked up without a restart and an unchanged one is never re-parsed.
+    """
+    url = _manifest_url()
+    last = _last_manifest_version()
+    try:
+        if url:
+            # runs on a user's rerun: one short try, not SESSION's retries + backoff
+            r = requests.head(url, timeout=3, allow_redirects=True)
+            r.raise_for_status()
+            version = f"{url}|{r.headers.get('etag') or r.headers.get('last-modified') or ''}"
+        elif LOCAL_MANIFEST.exists():
+            version = f"{LOCAL_MANIFEST}|{LOCAL_MANIFEST.stat().st_mtime_ns}"
+        else:
+            version = ""
+    except Exception:
+        # R2 slow/unreachable: keep the manifest we have rather than re-download it
+        return last.get("version", "")
+    last["version"] = version
+    return version
+
+@st.cache_resource
+def _last_manifest_version() -> dict:
+    return {}
+
+# Parsed manifest persisted across process restarts, tagged with the manifest_version
+# (ETag/Last-Modified or mtime) it was built from. Plain JSON, so loading it can't run
+# code, and kept in a private 0700 dir beside the app rather than the shared temp dir.
+MANIFEST_CACHE_DIR = BASE_DIR / ".cache"
+MANIFEST_CACHE = MANIFEST_CACHE_DIR / "manifest.json"
+
+def _private_cache_dir(path: Path = MANIFEST_CACHE_DIR) -> Path | None:
+    """`path` (created 0700 if missing) if it is ours and closed to other users, else None."""
+    try:
+        path.mkdir(mode=0o700, exist_ok=True)
+        info = path.stat()
+    except OSError:  # read-only checkout
+        return None
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        return None
+    return path
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_manifest(version: str = ""):
+    """Parsed manifest for this version: from the on-disk cache when its tag matches,
+    so a cold start skips the download + parse; rebuilt and re-cached otherwise."""
+    # "url|" (HEAD gave no validator) or "" can't prove the source is unchanged
+    cache_dir = _private_cache_dir() if version.partition("|")[2] else None
+    if cache_dir:
+        try:
+            with open(MANIFEST_CACHE, encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["version"] == version:
+                manifest = {(c, p, t): urls for c, p, t, urls in cached["rows"]}
+                return manifest, _index_by_cp(manifest)
+        except Exception:  # missing / truncated / older layout
+            pass
+    manifest, by_cp = _parse_manifest()
+    if cache_dir and manifest:
+        rows = [[c, p, t, urls] for (c, p, t), urls in manifest.items()]
+        try:
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"version": version, "rows": rows}, f)
+                os.replace(tmp, MANIFEST_CACHE)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        except OSError:
+            pass  # disk full etc.: the in-process cache still holds it
+    return manifest, by_cp
+
+def _parse_manifest():
     """
     Manifest CSV columns: Company,Product,Type,ImageURLs
     - Accepts any header case (company/product/type/imageurls)
     - Handles BOM & delimiter sniffing
     - Cleans accidental trailing '.jpg/' etc.
     - Registers BOTH (Company,Product,Type) AND (Company,Type,Product) to tolerate Excel/CSV swaps
+    Returns (manifest, by_cp): the exact-key dict plus a (company,product) ->
+    [(type, type_tokens, urls)] index (in manifest order) so soft Type matching only
+    scans one product's types, without re-tokenizing them per lookup.
     """
-    url = (st.secrets.get("IMAGE_MANIFEST_URL", "") or "").strip()
-    text = ""
-    rows = []
-
+    url = _manifest_url()
     try:
         if url:
-            r = requests.get(url, timeout=30)
+            r = SESSION.get(url, timeout=30)
             r.raise_for_status()
             text = r.content.decode("utf-8-sig", errors="replace")
         elif LOCAL_MANIFEST.exists():
             text = LOCAL_MANIFEST.read_text(encoding="utf-8-sig", errors="replace")
         else:
-            return {}
+            return {}, {}
     except Exception:
-        return {}
+        return {}, {}
 
     # Delimiter sniff
     try:
@@ -119,37 +329,52 @@ def load_manifest():
         delim = dialect.delimiter
     except Exception:
         delim = ","
-    reader = csv.DictReader(text.splitlines(), delimiter=delim)
+    try:
+        # index_col=False: a trailing delimiter on every row must not shift the columns;
+        # rows with extra fields are skipped, as csv.DictReader used to tolerate them
+        df = pd.read_csv(io.StringIO(text), sep=delim, dtype=str, keep_default_na=False,
+                         index_col=False, on_bad_lines="skip").fillna("")
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        return {}, {}
+    # any header case
+    df.columns = [str(col).strip().lower() for col in df.columns]
 
-    def ci(row, name):
-        name = name.lower()
-        for k, v in row.items():
-            if (k or "").strip().lower() == name:
-                return v
-        return ""
+    def col_norm(name):
+        if name not in df.columns:
+            return pd.Series("", index=df.index)
+        # vectorized _norm(): NFKC, trim, collapse internal spaces, lowercase
+        return df[name].str.normalize("NFKC").str.split().str.join(" ").str.lower()
+
+    c_col, p_col, t_col = col_norm("company"), col_norm("product"), col_norm("type")
 
-    def _clean_url(u: str) -> str:
-        u = (u or "").strip()
-        if u.lower().endswith((".jpg/", ".jpeg/", ".png/", ".webp/")):
-            u = u[:-1]
-        return u
+    # one row per URL; drop accidental trailing '/' after an image extension
+    urls = df["imageurls"] if "imageurls" in df.columns else pd.Series("", index=df.index)
+    urls = urls.str.split("|").explode().str.strip()
+    urls = urls.str.replace(r"(?i)(\.(?:jpg|jpeg|png|webp))/$", r"\1", regex=True)
+    urls = urls[urls != ""]
+    urls_by_row = urls.groupby(level=0, sort=False).agg(list)
 
     manifest = {}
-    for r in reader:
-        c = _norm(ci(r, "company"))
-        p = _norm(ci(r, "product"))
-        t = _norm(ci(r, "type"))
-        urls = [_clean_url(u) for u in (ci(r, "imageurls") or "").split("|") if _clean_url(u)]
-        if c and p and t and urls:
+    for c, p, t, row_urls in zip(c_col[urls_by_row.index], p_col[urls_by_row.index],
+                                 t_col[urls_by_row.index], urls_by_row):
+        if c and p and t:
             # exact key
-            manifest[(c, p, t)] = urls
+            manifest[(c, p, t)] = row_urls
             # swapped key to tolerate Excel vs CSV mismatch
-            manifest[(c, t, p)] = urls
+            manifest[(c, t, p)] = row_urls
 
-    return manifest
+    return manifest, _index_by_cp(manifest)
 
+def _index_by_cp(manifest):
+    """(company, product) -> [(type, type_tokens, urls)] in manifest order."""
+    by_cp = {}
+    for (c, p, t), row_urls in manifest.items():
+        by_cp.setdefault((c, p), []).append((t, _tokens(t), row_urls))
+    return by_cp
 
-MANIFEST = load_manifest()
+
+MANIFEST_VERSION = manifest_version()
+MANIFEST, MANIFEST_BY_CP = load_manifest(MANIFEST_VERSION)
 # ---- CASE-INSENSITIVE + SPACE-NORMALIZED HELPERS ----
 # st.caption(f"Manifest keys loaded: {len(MANIFEST) if MANIFEST else 0}")
 # ------------------------------------------------------------------------------
@@ -166,6 +391,36 @@ if 'last_temp_key' not in st.session_state:
 # Utility functions
 # ------------------------------------------------------------------------------
 
+def _match_from_manifest(manifest, by_cp, c, p, t):
+    """Steps 1-4 of get_image_list on normalized keys; None when the manifest has no hit."""
+    if not manifest:
+        return None
+    # L0 exact (includes swapped)
+    if (c, p, t) in manifest:
+        return manifest[(c, p, t)]
+
+    candidates = by_cp.get((c, p), [])
+
+    # L1 soft type (startswith / contains) under same (c,p)
+    for mt, _, urls in candidates:
+        if mt == t or mt.startswith(t) or t in mt:
+            return urls
+
+    # L2 token overlap on type
+    want = _tokens(t)
+    best, best_overlap = None, 0
+    for _, mt_tokens, urls in candidates:
+        ov = len(want & mt_tokens)
+        if ov > best_overlap:
+            best, best_overlap = urls, ov
+    if best and best_overlap > 0:
+        return best
+
+    # L3 any for (c,p) ignoring type
+    if candidates:
+        return candidates[0][2]
+    return None
+
 def get_image_list(company, product, ptype):
     """
     Resolution order:
@@ -176,48 +431,63 @@ def get_image_list(company, product, ptype):
       5) Local filesystem fallback images/Company/Product/Type/*
     """
     c_raw, p_raw, t_raw = company, product, ptype
-    c, p, t = _norm(c_raw), _norm(p_raw), _norm(t_raw)
 
     # ---- Manifest (URLs) ----
-    if MANIFEST:
-        # L0 exact (includes swapped)
-        if (c, p, t) in MANIFEST:
-            return MANIFEST[(c, p, t)]
-
-        # L1 soft type (startswith / contains) under same (c,p)
-        for (mc, mp, mt), urls in MANIFEST.items():
-            if mc == c and mp == p and (mt == t or mt.startswith(t) or t in mt):
-                return urls
-
-        # L2 token overlap on type
-        want = _tokens(t)
-        best, best_overlap = None, 0
-        for (mc, mp, mt), urls in MANIFEST.items():
-            if mc == c and mp == p:
-                ov = len(want & _tokens(mt))
-                if ov > best_overlap:
-                    best, best_overlap = urls, ov
-        if best and best_overlap > 0:
-            return best
-
-        # L3 any for (c,p) ignoring type
-        for (mc, mp, mt), urls in MANIFEST.items():
-            if mc == c and mp == p:
-                return urls
+    urls = _match_from_manifest(MANIFEST, MANIFEST_BY_CP, _norm(c_raw), _norm(p_raw), _norm(t_raw))
+    if urls:
+        return urls
 
     # ---- Local filesystem fallback (case-insensitive) ----
     folder = resolve_caseless_path(IMAGE_BASE, c_raw, p_raw, t_raw)
-    images = []
-    if folder and folder.exists():
-        for file in sorted(folder.iterdir()):
-            if file.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp"):
-                images.append(str(file))
-    return images
+    try:
+        return list(_list_images(str(folder), folder.stat().st_mtime_ns)) if folder else []
+    except OSError:  # folder vanished between resolve and stat
+        return []
+
+# cache_resource, not lru_cache: module globals are rebuilt on every rerun. The
+# directory mtime in the key changes whenever files are added, removed or renamed.
+@st.cache_resource(show_spinner=False, max_entries=4096)
+def _list_images(folder: str, mtime_ns: int) -> tuple:
+    """Sorted image file paths directly inside folder."""
+    with os.scandir(folder) as it:
+        names = sorted(e.name for e in it
+                       if os.path.splitext(e.name)[1].lower() in (".jpg", ".jpeg", ".png", ".webp"))
+    return tuple(str(Path(folder) / name) for name in names)
+
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def build_row_images(excel_mtime: float, manifest_ver: str):
+    """Manifest images for every sheet row, keyed by DataFrame index.
+
+    Resolved once per sheet/manifest version so rendering a row is a dict lookup;
+    rows without a manifest hit are absent and fall back to get_image_list.
+    """
+    df = load_excel(excel_mtime)
+    manifest, by_cp = load_manifest(manifest_ver)
+    row_images = {}
+    for idx, c, p, t in zip(df.index, df['Company'], df['Product'], df['Type']):
+        urls = _match_from_manifest(manifest, by_cp, _norm(c), _norm(p), _norm(t))
+        if urls:
+            row_images[idx] = urls
+    return row_images
+
+ROW_IMAGES = build_row_images(EXCEL_MTIME, MANIFEST_VERSION)
+
 
+# Slide image area (inches): up to 3 columns of equal cells between title and footer
+IMG_AREA_TOP, IMG_AREA_BOTTOM, IMG_PADDING = 1.2, 6.9, 0.2
 
+def image_grid(img_count, slide_width_in):
+    """(columns, rows, cell_width, cell_height) of the image grid for img_count images."""
+    columns = min(img_count, 3)
+    rows = (img_count + columns - 1) // columns
+    available_width = slide_width_in - (IMG_PADDING * (columns + 1))
+    available_height = (IMG_AREA_BOTTOM - IMG_AREA_TOP) - ((rows - 1) * IMG_PADDING)
+    return columns, rows, available_width / columns, available_height / rows
 
-def get_scaled_dimensions(img, max_width, max_height):
-    img_width_px, img_height_px = img.size
+def get_scaled_dimensions(size, max_width, max_height):
+    img_width_px, img_height_px = size
     aspect_ratio = img_width_px / img_height_px
     box_aspect = max_width / max_height
     if aspect_ratio > box_aspect:
@@ -228,41 +498,350 @@ def get_scaled_dimensions(img, max_width, max_height):
         width = height * aspect_ratio
     return width, height
 
-# NEW: open image from URL or local path for dimension calculation
-def open_pil_image(path_or_url):
-    if "://" in str(path_or_url):
-        resp = requests.get(path_or_url, timeout=60)
-        resp.raise_for_status()
-        return Image.open(io.BytesIO(resp.content))
-    return Image.open(path_or_url)
+def image_pixel_size(path):
+    # deck images are prefetched to local files; never download here a second time.
+    # Image.open only parses the header, so .size costs no pixel decode.
+    with Image.open(path) as img:
+        return img.size
+
+def _image_ext(url, content_type=""):
+    """Pick a file suffix from the response Content-Type, falling back to the URL."""
+    ct = (content_type or "").split(";")[0].strip().lower()
+    if ct == "image/png" or (not ct.startswith("image/") and url.lower().endswith(".png")):
+        return ".png"
+    return ".jpg"
+
+# Downloaded images persist here across builds/reruns, keyed by sha1(url), so a
+# regenerated deck doesn't hit R2 again for images it already has. Its files go
+# straight into customer decks, so it gets the same private-dir check as the manifest.
+@st.cache_resource
+def _img_cache_dir() -> Path:
+    """
+    MANIFEST_CACHE_DIR/img when both dirs are private to us. Otherwise a fresh 0700
+    temp dir for this process only: no persistent cache, but nothing another local
+    user planted is ever served.
+    """
+    if _private_cache_dir() and (img_dir := _private_cache_dir(MANIFEST_CACHE_DIR / "img")):
+        return img_dir
+    return Path(tempfile.mkdtemp(prefix="altossa_img_"))
+
+IMG_CACHE_DIR = _img_cache_dir()
+
+@st.cache_resource
+def _sweep_stale_partials(max_age_s=3600):
+    """
+    Delete *.tmp partial writes left in the cache by a killed process (live writes
+    clean up after themselves). Once per process; cached images are kept on purpose.
+    """
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for tmp in IMG_CACHE_DIR.glob("*.tmp"):
+        try:
+            if tmp.stat().st_mtime < cutoff:
+                tmp.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+_sweep_stale_partials()
+
+def _cache_hit(path):
+    """
+    True if cache file `path` exists, stamping its atime as the last use so pruning
+    evicts least recently used entries. mtime is kept: prepare_image keys on it.
+    """
+    try:
+        os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        return True
+    except OSError:
+        return False
+
+# Cached originals, prepared copies and thumbnails would otherwise grow without bound.
+IMG_CACHE_MAX_BYTES = 2 * 1024 ** 3
+IMG_CACHE_MAX_AGE_S = 7 * 24 * 3600
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def _prune_image_cache(max_bytes=IMG_CACHE_MAX_BYTES, max_age_s=IMG_CACHE_MAX_AGE_S, min_age_s=3600):
+    """
+    Drop cache entries unused for max_age_s, then the least recently used until the
+    total fits max_bytes. Every cache hit re-stamps its file (_cache_hit), and files
+    used within min_age_s are never touched, so paths a running build or warm-up was
+    just handed stay valid. Runs at most once an hour.
+    """
+    entries = []
+    try:
+        with os.scandir(IMG_CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        info = entry.stat()
+                        used = max(info.st_atime, info.st_mtime)
+                        entries.append((used, info.st_size, entry.path))
+                except OSError:
+                    continue
+    except OSError:  # no cache yet
+        return 0
+    entries.sort()  # least recently used first
+    total = sum(size for _, size, _ in entries)
+    now, removed = time.time(), 0
+    for used, size, path in entries:
+        age = now - used
+        if age < min_age_s or (age <= max_age_s and total <= max_bytes):
+            break  # everything after this is newer still
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+_prune_image_cache()
 
-# NEW: for python-pptx add_picture() which needs a path/stream; easiest is temp file
 def fetch_to_tempfile(path_or_url):
     if "://" not in str(path_or_url):
         return path_or_url
-    resp = requests.get(path_or_url, timeout=60)
-    resp.raise_for_status()
-    # infer ext from URL
-    ext = ".png" if path_or_url.lower().endswith(".png") else ".jpg"
-    fd, tpath = tempfile.mkstemp(suffix=ext)
-    with os.fdopen(fd, "wb") as f:
-        f.write(resp.content)
-    return tpath
-
-def create_beautiful_ppt(slide_data_list, include_intro_outro=True):
+    key = hashlib.sha1(path_or_url.encode("utf-8")).hexdigest()
+    for ext in (".jpg", ".png"):
+        cached = IMG_CACHE_DIR / f"{key}{ext}"
+        if _cache_hit(cached):
+            return str(cached)
+
+    # stream the body straight to disk instead of buffering it in RAM
+    if HTTP2_CLIENT is not None:
+        with HTTP2_CLIENT.stream("GET", path_or_url) as resp:
+            resp.raise_for_status()
+            target = IMG_CACHE_DIR / f"{key}{_image_ext(path_or_url, resp.headers.get('content-type'))}"
+            _write_cache_file(target, resp.iter_bytes(65536))
+    else:
+        resp = SESSION.get(path_or_url, timeout=60, stream=True)
+        try:
+            resp.raise_for_status()
+            target = IMG_CACHE_DIR / f"{key}{_image_ext(path_or_url, resp.headers.get('content-type'))}"
+            _write_cache_file(target, resp.iter_content(65536))
+        finally:
+            resp.close()
+    return str(target)
+
+# Image downloads are I/O-bound: fetch every unique image of the deck concurrently
+# up front, then do the python-pptx work serially with local paths.
+DOWNLOAD_WORKERS = 16
+
+def prefetch_images(slide_data_list, slide_width_in):
+    """Return {image src: prepared local path} for all images in the deck (each fetched once)."""
+    boxes = {}  # src -> largest pixel box it is shown in across the deck's slides
+    for item in slide_data_list:
+        imgs = item.get('images', [])
+        if not imgs:
+            continue
+        _, _, cell_w, cell_h = image_grid(len(imgs), slide_width_in)
+        box = (min(PREPARED_MAX_PX[0], math.ceil(cell_w * EMBED_DPI)),
+               min(PREPARED_MAX_PX[1], math.ceil(cell_h * EMBED_DPI)))
+        for src in imgs:
+            if src:
+                old = boxes.get(src, (0, 0))
+                boxes[src] = (max(old[0], box[0]), max(old[1], box[1]))
+    if not boxes:
+        return {}
+    srcs = list(boxes)
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(srcs))) as ex:
+        return dict(zip(srcs, ex.map(_fetch_and_prepare, srcs, [boxes[s] for s in srcs])))
+
+def _fetch_and_prepare(src, max_px):
+    # Runs on the prefetch pool: each worker resizes its image as soon as it lands,
+    # overlapping CPU work with the other downloads. Pillow releases the GIL while
+    # decoding, resampling and encoding, so threads use multiple cores here.
+    return prepare_image(fetch_to_tempfile(src), max_px)
+
+# While the user is still browsing a product, warm the disk cache with the images on
+# screen so "Generate" mostly finds them local. Few workers and a small cap on queued
+# jobs: this must not starve the build or pile up behind a big page.
+PREFETCH_WORKERS = 4
+PREFETCH_MAX_PENDING = 32
+PREFETCH_SEEN_MAX = 4096
+
+@st.cache_resource
+def _prefetch_state():
+    # (pool, URLs already submitted, free slots for queued + running jobs)
+    return (ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="img-prefetch"),
+            set(), threading.BoundedSemaphore(PREFETCH_MAX_PENDING))
+
+def warm_image_cache(srcs):
+    """Fire-and-forget background downloads of URL images not yet submitted."""
+    executor, seen, slots = _prefetch_state()
+    for src in srcs:
+        s = str(src).strip()
+        if "://" not in s or s in seen:
+            continue
+        if not slots.acquire(blocking=False):
+            return  # queue full: skip; a later rerun offers the rest again
+        if len(seen) >= PREFETCH_SEEN_MAX:
+            seen.clear()  # dedupe memory only; the slots above bound the work
+        seen.add(s)
+        # errors are dropped (the build retries); the slot frees either way
+        executor.submit(_warm_preview, s).add_done_callback(lambda _f: slots.release())
+
+# Gallery columns are ~170px wide: once an image is cached, previews serve a small
+# JPEG instead of every browser pulling the multi-MB original.
+THUMB_PX = (256, 256)
+
+def _thumb_path(url):
+    return IMG_CACHE_DIR / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.thumb.jpg"
+
+def _warm_preview(url):
+    # download into the disk cache (for the deck), then derive the gallery thumbnail
+    local = fetch_to_tempfile(url)
+    thumb = _thumb_path(url)
+    if not _cache_hit(thumb):
+        _write_cache_file(thumb, [_resize_bytes(local, False, THUMB_PX)])
+
+# R2 originals are often 4000px+ JPEGs, but the largest slide cell is ~12.7"x5.7".
+# Embedding a downscaled JPEG keeps the .pptx small and prs.save() fast.
+PREPARED_MAX_PX = (1600, 720)
+# Images are resized to their grid cell at this density (capped by PREPARED_MAX_PX),
+# so a 3x2 grid embeds ~830px-wide copies rather than full-slide-sized ones.
+EMBED_DPI = 200
+
+def prepare_image(src_path, max_px=PREPARED_MAX_PX):
+    """Return a path to a copy of src_path downscaled to fit max_px (cached on disk)."""
+    try:
+        with Image.open(src_path) as probe:  # reads the header only, no pixel decode
+            (w, h), fmt = probe.size, probe.format
+            has_alpha = probe.mode in ("RGBA", "LA", "PA") or "transparency" in probe.info
+        max_w, max_h = max_px
+        if fmt in ("JPEG", "PNG") and w <= max_w and h <= max_h:
+            return src_path  # already fits: embed as-is, skip the re-encode
+        # only PNGs with an alpha channel stay PNG (so transparency survives); opaque
+        # renders/photos saved as PNG re-encode to a far smaller JPEG
+        as_png = fmt == "PNG" and has_alpha
+        mtime = os.stat(src_path).st_mtime_ns
+        key = hashlib.sha1(f"{os.path.abspath(src_path)}:{mtime}:{max_w}x{max_h}".encode("utf-8")).hexdigest()
+        out = IMG_CACHE_DIR / f"{key}.opt{'.png' if as_png else '.jpg'}"
+        if not _cache_hit(out):
+            _write_cache_file(out, [_resize_bytes(src_path, as_png, max_px)])
+        return str(out)
+    except Exception:
+        # unreadable/odd image: embed the original rather than fail the deck
+        return src_path
+
+def _resize_bytes(src_path, as_png, max_px):
+    """Encoded bytes of src_path shrunk to fit max_px: libvips if present, else Pillow."""
+    if pyvips is not None:
+        try:
+            return _vips_resize(src_path, as_png, max_px)
+        except pyvips.Error:
+            pass  # format libvips can't load: let Pillow try
+    return _pil_resize(src_path, as_png, max_px)
+
+def _vips_resize(src_path, as_png, max_px):
+    # shrink-on-load: libjpeg decodes at 1/2, 1/4 or 1/8 scale, never the full 4K frame
+    w, h = max_px
+    im = pyvips.Image.thumbnail(src_path, w, height=h, size="down")
+    if as_png:
+        return im.pngsave_buffer()
+    if im.hasalpha():
+        im = im.flatten(background=[255, 255, 255])
+    return im.jpegsave_buffer(Q=85, optimize_coding=True, interlace=True, strip=True)
+
+def _pil_resize(src_path, as_png, max_px):
+    with Image.open(src_path) as src:
+        # JPEG DCT downscale first (2x headroom, like thumbnail's reducing_gap, for
+        # either orientation), then apply the EXIF rotation as libvips thumbnail does
+        side = 2 * max(max_px)
+        src.draft(None, (side, side))
+        im = ImageOps.exif_transpose(src)
+        im.thumbnail(max_px, Image.LANCZOS)
+        buf = io.BytesIO()
+        if as_png:
+            im.save(buf, "PNG")
+            return buf.getvalue()
+        if im.mode in ("RGBA", "LA", "P"):
+            # flatten transparency onto the white slide background
+            rgba = im.convert("RGBA")
+            im = Image.new("RGB", rgba.size, (255, 255, 255))
+            im.paste(rgba, mask=rgba.getchannel("A"))
+        im.convert("RGB").save(buf, "JPEG", quality=85, optimize=True, progressive=True)
+        return buf.getvalue()
+
+def _write_cache_file(out, chunks):
+    """Write an iterable of byte chunks to `out` atomically (tmp file + os.replace)."""
+    IMG_CACHE_DIR.mkdir(mode=0o700, exist_ok=True)  # recreate if cleaned up under us
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=IMG_CACHE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        # readers never see a half-written file
+        os.replace(tmp, out)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+@st.cache_resource
+def _logo_index():
+    """{normalized company folder: logo path} for static/logo, scanned once per process."""
+    index = {}
+    base = Path(LOGO_BASE)
+    if base.is_dir():
+        for company_dir in base.iterdir():
+            if not company_dir.is_dir():
+                continue
+            found = {p.suffix.lower(): p for p in company_dir.glob("logo.*")}
+            for ext in (".png", ".jpg", ".jpeg"):
+                if ext in found:
+                    index.setdefault(_norm(company_dir.name), str(found[ext]))
+                    break
+    return index
+
+# warmed at startup on the script thread; PPT builds (worker threads) only read it
+LOGO_INDEX = _logo_index()
+
+def logo_path_for_company(company: str) -> str | None:
+    """static/logo/<Company>/logo.(png|jpg|jpeg), matching the folder case-insensitively."""
+    return LOGO_INDEX.get(_norm(company))
+
+# python-pptx deflates every part at level 6, which burns CPU on JPEG/PNG media for
+# ~0% size gain. Store media as-is and deflate the XML parts at level 1 instead:
+# prs.save() gets ~4x faster for a few % larger file.
+# _ZipPkgWriter is private: if a python-pptx release renames it or its zip handle,
+# the stock writer is used instead. The original is kept on the class because
+# Streamlit re-executes this module on every rerun.
+def _pptx_zip_write(self, pack_uri, blob):
+    zipf = getattr(self, "_zipf", None)
+    if zipf is None:
+        return _ZipPkgWriter._stock_write(self, pack_uri, blob)
+    name = pack_uri.membername
+    if name.startswith("ppt/media/"):
+        zipf.writestr(name, blob, compress_type=zipfile.ZIP_STORED)
+    else:
+        zipf.writestr(name, blob, compresslevel=1)
+
+if _ZipPkgWriter is not None and hasattr(_ZipPkgWriter, "write"):
+    if not hasattr(_ZipPkgWriter, "_stock_write"):
+        _ZipPkgWriter._stock_write = _ZipPkgWriter.write
+    _ZipPkgWriter.write = _pptx_zip_write
+
+@st.cache_resource
+def _ppt_template():
+    """Empty 16:9 deck, parsed once per process; each build works on a deep copy."""
     prs = Presentation()
     prs.slide_width = Inches(13.33)
     prs.slide_height = Inches(7.5)
-    blank = prs.slide_layouts[6]
-    # keep your original first/last paths (you placed 'img/' in the repo)
-    first_slide_path = str(FIRST_PATH)
-    last_slide_path  = str(LAST_PATH)
+    return prs
 
-    if include_intro_outro and os.path.exists(first_slide_path):
+def create_beautiful_ppt(slide_data_list, include_intro_outro=True, on_progress=None, template=None):
+    # background builds pass the template in: st.cache_resource needs the script thread
+    prs = copy.deepcopy(template if template is not None else _ppt_template())
+    blank = prs.slide_layouts[6]
+    if include_intro_outro and FIRST_LOCAL:
         slide = prs.slides.add_slide(blank)
-        slide.shapes.add_picture(first_slide_path, Inches(0), Inches(0), width=prs.slide_width, height=prs.slide_height)
+        slide.shapes.add_picture(FIRST_LOCAL, Inches(0), Inches(0), width=prs.slide_width, height=prs.slide_height)
+
+    local_paths = prefetch_images(slide_data_list, prs.slide_width.inches)
+    pixel_sizes = {}  # local path -> (w, h) px, probed once per unique image
 
-    for slide_data in slide_data_list:
+    for n, slide_data in enumerate(slide_data_list, start=1):
         slide = prs.slides.add_slide(blank)
         company = slide_data.get('company', '')
         product = slide_data.get('product', '')
@@ -278,48 +857,34 @@ def create_beautiful_ppt(slide_data_list, include_intro_outro=True):
         p.font.color.rgb = RGBColor(0, 0, 0)
 
         # Images
-        y_img_top = 1.2
-        y_img_bottom = 6.9
-        max_img_height = y_img_bottom - y_img_top
-        slide_width_in = prs.slide_width.inches
+        y_img_top = IMG_AREA_TOP
         imgs = slide_data['images']
         img_count = len(imgs)
 
         if img_count > 0:
-            padding = 0.2
-            columns = min(img_count, 3)
-            rows = (img_count + columns - 1) // columns
-            available_width = slide_width_in - (padding * (columns + 1))
-            available_height = max_img_height - ((rows - 1) * padding)
-            cell_width = available_width / columns
-            cell_height = available_height / rows
+            padding = IMG_PADDING
+            columns, rows, cell_width, cell_height = image_grid(img_count, prs.slide_width.inches)
 
             for i, img_src in enumerate(imgs):
                 row = i // columns
                 col = i % columns
-                # open PIL image from URL or path (for sizing only)
+                # already downloaded by prefetch_images(); a repeated image maps to the
+                # same path, so python-pptx stores a single media part for it
+                add_path = local_paths[img_src]
                 try:
-                    with open_pil_image(img_src) as img:
-                        img_width, img_height = get_scaled_dimensions(img, max_width=cell_width, max_height=cell_height)
+                    if add_path not in pixel_sizes:
+                        pixel_sizes[add_path] = image_pixel_size(add_path)
+                    img_width, img_height = get_scaled_dimensions(pixel_sizes[add_path], max_width=cell_width, max_height=cell_height)
                 except Exception:
                     # If PIL fails, default fit box to avoid crash
                     img_width, img_height = cell_width, cell_height
 
                 x = padding + col * (cell_width + padding) + (cell_width - img_width) / 2
                 y = y_img_top + row * (cell_height + padding) + (cell_height - img_height) / 2
-                # ensure python-pptx gets a local path
-                add_path = fetch_to_tempfile(img_src)
                 slide.shapes.add_picture(add_path, Inches(x), Inches(y), width=Inches(img_width), height=Inches(img_height))
 
         # Logo (case-insensitive company folder)
-        logo_dir = resolve_caseless_path(LOGO_BASE, company)
-        logo_path = None
-        if logo_dir and logo_dir.exists():
-            for ext in (".png", ".jpg", ".jpeg"):
-                cand = logo_dir / f"logo{ext}"
-                if cand.exists():
-                    logo_path = str(cand)
-                    break
+        logo_path = logo_path_for_company(company)
         if logo_path:
             slide.shapes.add_picture(logo_path, prs.slide_width - Inches(1.2), Inches(0.1), width=Inches(1.1))
 
@@ -338,12 +903,31 @@ def create_beautiful_ppt(slide_data_list, include_intro_outro=True):
             p.font.size = Pt(10)
             p.font.color.rgb = RGBColor(0, 102, 204)
 
-    if include_intro_outro and os.path.exists(last_slide_path):
+        if on_progress:
+            on_progress(n, len(slide_data_list))
+
+    if include_intro_outro and LAST_LOCAL:
         slide = prs.slides.add_slide(blank)
-        slide.shapes.add_picture(last_slide_path, Inches(0), Inches(0), width=prs.slide_width, height=prs.slide_height)
+        slide.shapes.add_picture(LAST_LOCAL, Inches(0), Inches(0), width=prs.slide_width, height=prs.slide_height)
 
     return prs
 
+def build_ppt_bytes(slide_data_list, include_intro_outro=True, progress=None, template=None):
+    """Build the deck and return the .pptx bytes; `progress` dict gets done/total per slide."""
+    def on_progress(done, total):
+        if progress is not None:
+            progress.update(done=done, total=total)
+    prs = create_beautiful_ppt(slide_data_list, include_intro_outro, on_progress=on_progress, template=template)
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+# PPT builds run off the script thread so the page stays interactive while images
+# download/render; the sidebar polls the Future from session_state.
+@st.cache_resource
+def _ppt_executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="ppt-build")
+
 # ------------------------------------------------------------------------------
 # UI (UNCHANGED)
 # ------------------------------------------------------------------------------
@@ -352,37 +936,55 @@ search_query = st.text_input("Search by Type", "")
 
 if 'search_selection_keys' not in st.session_state:
     st.session_state.search_selection_keys = set()
+# search row key -> images ticked in it; outlives the row's "Show images" toggle
+if 'search_selection' not in st.session_state:
+    st.session_state.search_selection = {}
 
 if search_query:
-    filtered_data = data[data['Type'].str.contains(search_query, case=False, na=False)]
+    # plain substring test on the pre-lowered column: no per-keystroke regex compile
+    filtered_data = data[TYPE_LOWER.str.contains(search_query.lower(), regex=False, na=False)]
     for idx, row in filtered_data.iterrows():
         company, product, ptype, link = row['Company'], row['Product'], row['Type'], row.get('Link', '')
-        img_paths = get_image_list(company, product, ptype)
+        img_paths = ROW_IMAGES.get(idx) or get_image_list(company, product, ptype)
         img_paths = [p for p in img_paths if p and str(p).strip()]
-        
+
         st.markdown(f"### {product} - {ptype}")
-        if len(img_paths) > 0:
-            cols = st.columns(min(4, len(img_paths)))
-            selected_imgs = []
-            for i, path in enumerate(img_paths):
-                with cols[i % len(cols)]:
-                    # st.image supports both local paths and URLs
-                    show_image_safe(path)
-                    key = f"search_{company}_{product}_{ptype}_{i}".replace(" ", "_")
-                    if st.checkbox("Include", key=key):
-                        selected_imgs.append(path)
+        if not img_paths:
+            continue
+        row_key = f"{company}_{product}_{ptype}".replace(" ", "_")
+        selected_imgs = st.session_state.search_selection.get(row_key, [])
+        # a broad query can match hundreds of rows: previews (and their downloads) are
+        # only emitted for rows the user opens
+        if not st.toggle(f"Show images ({len(img_paths)})", key=f"show_{row_key}"):
             if selected_imgs:
-                st.session_state.ppt_items[f"{company}_{product}_{ptype}".replace(" ", "_")] = {
-                    "company": company,
-                    "product": product,
-                    "link": link,
-                    "images": selected_imgs
-                }
+                st.caption(f"{len(selected_imgs)} selected")
+            continue
+        warm_image_cache(img_paths)
+        cols = st.columns(min(4, len(img_paths)))
+        ticked = []
+        for i, path in enumerate(img_paths):
+            with cols[i % len(cols)]:
+                # st.image supports both local paths and URLs
+                show_image_safe(path)
+                key = f"search_{company}_{product}_{ptype}_{i}".replace(" ", "_")
+                # a closed row drops its checkbox state; restore it from the selection
+                if key not in st.session_state:
+                    st.session_state[key] = path in selected_imgs
+                if st.checkbox("Include", key=key):
+                    ticked.append(path)
+        selected_imgs = st.session_state.search_selection[row_key] = ticked
+        if selected_imgs:
+            st.session_state.ppt_items[row_key] = {
+                "company": company,
+                "product": product,
+                "link": link,
+                "images": selected_imgs
+            }
 else:
-    company = st.selectbox("Select Company", sorted(data['Company'].dropna().unique()), key="company")
-    products = sorted(data[data['Company'] == company]['Product'].dropna().unique())
+    company = st.selectbox("Select Company", COMPANIES, key="company")
+    products = PRODUCTS_BY_COMPANY.get(company, ())
     product = st.selectbox("Select Product", products, key="product")
-    filtered_rows = data[(data['Company'] == company) & (data['Product'] == product)]
+    filtered_rows = ROWS_BY_CP.get((company, product), ())
 
     current_base_key = f"{company}_{product}"
     if st.session_state.last_temp_key and st.session_state.last_temp_key != current_base_key:
@@ -392,10 +994,10 @@ else:
         st.session_state.temp_selection = {}
     st.session_state.last_temp_key = current_base_key
 
-    for idx, row in filtered_rows.iterrows():
-        ptype, link = row['Type'], row.get("Link", "")
-        img_paths = get_image_list(company, product, ptype)
+    for idx, ptype, link in filtered_rows:
+        img_paths = ROW_IMAGES.get(idx) or get_image_list(company, product, ptype)
         img_paths = [p for p in img_paths if p and str(p).strip()]
+        warm_image_cache(img_paths)
 
         st.markdown(f"### {ptype}")
         
@@ -429,30 +1031,66 @@ with st.sidebar:
 
     if 'ppt_ready' not in st.session_state:
         st.session_state.ppt_ready = False
-    if 'ppt_path' not in st.session_state:
-        st.session_state.ppt_path = None
+    if 'ppt_bytes' not in st.session_state:
+        st.session_state.ppt_bytes = None
+
+    if 'ppt_job' not in st.session_state:
+        st.session_state.ppt_job = None
 
-    if st.button("📦 Generate Combined PPT"):
-        all_items = list(st.session_state.ppt_items.values())
+    if st.button("📦 Generate Combined PPT", disabled=st.session_state.ppt_job is not None):
+        # snapshot: the selection lists are appended to in place by later reruns,
+        # which must not reach a build already running on another thread
+        built = {k: {**v, "images": list(v["images"])} for k, v in st.session_state.ppt_items.items()}
+        all_items = list(built.values())
         if all_items:
-            prs = create_beautiful_ppt(all_items, include_intro_outro=True)
-            ppt_path = "combined_presentation.pptx"
-            prs.save(ppt_path)
-            st.session_state.ppt_path = ppt_path
+            progress = {"done": 0, "total": len(all_items)}
+            future = _ppt_executor().submit(build_ppt_bytes, all_items, True, progress, _ppt_template())
+            # selections are cleared once the build succeeds (ppt_job_status), so a
+            # failed build keeps them for a retry
+            st.session_state.ppt_job = (future, progress, built)
+            st.session_state.ppt_ready = False
+        else:
+            st.warning("No items selected for presentation!")
+
+    # Only this fragment re-runs while a build is in flight, once per second.
+    @st.fragment(run_every=1 if st.session_state.ppt_job else None)
+    def ppt_job_status():
+        job = st.session_state.ppt_job
+        if job is None:
+            return
+        future, progress, built = job
+        if not future.done():
+            done, total = progress["done"], progress["total"]
+            st.progress(done / max(total, 1), text=f"Building PPT… {done}/{total} slides")
+            return
+        st.session_state.ppt_job = None
+        try:
+            st.session_state.ppt_bytes = future.result()
             st.session_state.ppt_ready = True
-            st.success("PPT generated successfully!")
-            # Clear selections after generation
-            st.session_state.ppt_items = {}
+            st.session_state.ppt_notice = "PPT generated successfully!"
+            # Clear selections after generation; items picked or changed while it ran are kept
+            for key, item in built.items():
+                current = st.session_state.ppt_items.get(key)
+                if current is not None and current["images"] == item["images"]:
+                    del st.session_state.ppt_items[key]
             st.session_state.temp_selection = {}
+            st.session_state.search_selection = {}
             st.session_state.last_temp_key = None
-        else:
-            st.warning("No items selected for presentation!")
+        except Exception as e:
+            st.session_state.ppt_error = f"PPT generation failed: {e}"
+        st.rerun()
+
+    ppt_job_status()
+
+    if st.session_state.get("ppt_error"):
+        st.error(st.session_state.pop("ppt_error"))
+    if st.session_state.get("ppt_notice"):
+        st.success(st.session_state.pop("ppt_notice"))
 
-    if st.session_state.ppt_ready and st.session_state.ppt_path and os.path.exists(st.session_state.ppt_path):
-        with open(st.session_state.ppt_path, "rb") as f:
-            st.download_button(
-                "Download Combined PPT",
-                f,
-                file_name="combined_presentation.pptx",
-                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
-            )
+    if st.session_state.ppt_ready and st.session_state.ppt_bytes:
+        st.download_button(
+            "Download Combined PPT",
+            st.session_state.ppt_bytes,
+            file_name="combined_presentation.pptx",
+            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
+        )